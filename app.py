@@ -1,26 +1,41 @@
 import os
 import time
+import asyncio
 import uuid
-import json
 from typing import List, Dict, Any, Optional
 
 import dashvector
-from cachetools import TTLCache
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json
+    orjson = None
+
+from competitors_searcher.dashvector_client import get_client, meta_cache_get, meta_cache_put
 from competitors_searcher.pipeline.retrieval import search_competitors
 from competitors_searcher.pipeline.batch_parse import start_pipeline_task
 from competitors_searcher.configs.settings import DASHVECTOR_API_KEY_, DASHVECTOR_ENDPOINT_, DASHVECTOR_COLLECTION_, META_DOC_ID_LATEST
-from competitors_searcher.logs.logger_config import get_logger
+from competitors_searcher.logs.logger_config import get_logger, _json_dumps_safe
 
 logger = get_logger("api")
 
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
 app = FastAPI(
     title="Competitor Retrieval Service",
     version="1.0.0",
     description="提供：索引构建触发/状态查询/竞品检索",
+    default_response_class=OrjsonResponse,
 )
 
 # =========================
@@ -32,7 +47,6 @@ DASHVECTOR_ENDPOINT = DASHVECTOR_ENDPOINT_
 
 _dv_client: Optional[dashvector.Client] = None
 _dv_collection = None
-_meta_cache = TTLCache(maxsize=16, ttl=3)
 
 def _get_collection():
     global _dv_client, _dv_collection
@@ -42,7 +56,7 @@ def _get_collection():
     if not DASHVECTOR_API_KEY or not DASHVECTOR_ENDPOINT:
         raise RuntimeError("DASHVECTOR_API_KEY / DASHVECTOR_ENDPOINT 未设置")
 
-    _dv_client = dashvector.Client(api_key=DASHVECTOR_API_KEY, endpoint=DASHVECTOR_ENDPOINT)
+    _dv_client = get_client(DASHVECTOR_API_KEY, DASHVECTOR_ENDPOINT)
     _dv_collection = _dv_client.get(name=DASHVECTOR_COLLECTION)
     if not _dv_collection:
         raise RuntimeError(f"DashVector collection not found: {DASHVECTOR_COLLECTION}")
@@ -50,8 +64,9 @@ def _get_collection():
 
 def _read_latest_meta() -> Dict[str, Any]:
     cache_key = "latest_meta"
-    if cache_key in _meta_cache:
-        return _meta_cache[cache_key]
+    cached = meta_cache_get(cache_key)
+    if cached is not None:
+        return cached
 
     col = _get_collection()
     # prefer fetch API
@@ -64,59 +79,88 @@ def _read_latest_meta() -> Dict[str, Any]:
         raise RuntimeError(f"latest meta doc not found: {META_DOC_ID_LATEST}")
 
     fields = getattr(doc, "fields", None) or {}
-    _meta_cache[cache_key] = fields
+    meta_cache_put(cache_key, fields)
     return fields
 
 # =========================
 # Logging middleware
 # =========================
+REQ_PREVIEW_BYTES = 4096
+_NO_BODY_METHODS = ("GET", "HEAD", "DELETE")
+# probe endpoints: no trace/body/log work at all
+_UNLOGGED_PATHS = frozenset(("/health", "/metrics", "/livez", "/readyz"))
+
+def _content_length(request: Request) -> Optional[int]:
+    try:
+        return int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+def _route_path(request: Request) -> str:
+    # strip the mount prefix when running as a sub-application
+    path = request.url.path
+    root_path = request.scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):] or "/"
+    return path
+
 class AccessLogMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
+        if _route_path(request) in _UNLOGGED_PATHS:
+            return await call_next(request)
+
         trace_id = request.headers.get("x-trace-id") or uuid.uuid4().hex
         start = time.perf_counter()
 
-        # request preview
+        # request preview: only buffer non-empty bodies that fit in the preview window
         req_preview = ""
-        try:
-            body = await request.body()
-            if body:
-                req_preview = body[:4096].decode("utf-8", errors="ignore")
-        except Exception:
-            req_preview = ""
+        content_length = _content_length(request)
+        if (
+            request.method not in _NO_BODY_METHODS
+            and content_length is not None
+            and 0 < content_length <= REQ_PREVIEW_BYTES
+        ):
+            try:
+                body = await request.body()
+                if body:
+                    req_preview = body[:REQ_PREVIEW_BYTES].decode("utf-8", errors="ignore")
+            except Exception:
+                req_preview = ""
 
-        logger.info(json.dumps({
+        logger.info(_json_dumps_safe({
             "event": "http_in",
             "trace_id": trace_id,
             "method": request.method,
             "path": request.url.path,
             "query": str(request.url.query),
             "client": getattr(request.client, "host", None),
+            "content_length": content_length,
             "req_preview": req_preview,
-        }, ensure_ascii=False))
+        }))
 
         try:
             response = await call_next(request)
         except Exception as e:
             cost_ms = int((time.perf_counter() - start) * 1000)
-            logger.error(json.dumps({
+            logger.error(_json_dumps_safe({
                 "event": "http_err",
                 "trace_id": trace_id,
                 "method": request.method,
                 "path": request.url.path,
                 "cost_ms": cost_ms,
                 "error": str(e),
-            }, ensure_ascii=False), exc_info=True)
+            }), exc_info=True)
             raise
 
         cost_ms = int((time.perf_counter() - start) * 1000)
-        logger.info(json.dumps({
+        logger.info(_json_dumps_safe({
             "event": "http_out",
             "trace_id": trace_id,
             "method": request.method,
             "path": request.url.path,
             "status_code": getattr(response, "status_code", None),
             "cost_ms": cost_ms,
-        }, ensure_ascii=False))
+        }))
         return response
 
 app.add_middleware(AccessLogMiddleware)
@@ -135,6 +179,8 @@ class IndexStatusResponse(BaseModel):
     content: Dict[str, Any]
 
 class CompetitorQuery(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=False, validate_assignment=False)
+
     product_id: str = Field(default="", description="产品唯一 ID，可为空字符串")
     product_name: str = Field(..., description="产品名称")
     product_track: str = Field(..., description="产品赛道，例如：医疗险、重疾险")
@@ -154,17 +200,17 @@ class SearchCompetitorsResponse(BaseModel):
 # Health
 # =========================
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 # =========================
 # 1) 数据准备
 # =========================
 @app.post("/v1/index/build", response_model=BuildIndexResponse)
-def build_index():
+async def build_index():
     try:
         logger.info("build_index called")
-        return start_pipeline_task()
+        return await asyncio.to_thread(start_pipeline_task)
     except Exception as e:
         logger.error("build failed", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -201,7 +247,7 @@ def index_status():
 # 3) 竞品发现
 # =========================
 @app.post("/v1/search_competitors", response_model=SearchCompetitorsResponse)
-def search_competitors_endpoint(req: CompetitorQuery):
+async def search_competitors_endpoint(req: CompetitorQuery):
     logger.info(f"search_competitors request product={req.product_name}")
     try:
         query: Dict[str, Any] = {
@@ -213,7 +259,8 @@ def search_competitors_endpoint(req: CompetitorQuery):
             "selected_channel": req.selected_channel,
         }
 
-        result = search_competitors(
+        result = await asyncio.to_thread(
+            search_competitors,
             query=query,
             rerank_threshold=req.rerank_threshold,
             max_results=req.max_results,
@@ -1,20 +1,27 @@
 # -*- coding: utf-8 -*-
 
 import os
-import ast
+import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from cachetools import LRUCache
 
 import dashvector
+import grpc
 from dashvector import Doc
+from dashvector.common.error import DashVectorCode, DashVectorException
 
 from dashtext import SparseVectorEncoder
+from competitors_searcher.dashvector_client import collection_dtype, get_client, quantize_vectors
 from competitors_searcher.get_sql import _load_dataframe
-from competitors_searcher.models.nlp_models import emb_call
+from competitors_searcher.models.nlp_models import emb_call, emb_call_batch
+from competitors_searcher.text_utils import parse_list_like
 
 # ========================
 # 配置区
@@ -48,6 +55,27 @@ COLLECTION_NAME = os.getenv("DASHVECTOR_COLLECTION", "competitor_products_dev")
 # 批量写入
 BATCH_DOCS = int(os.getenv("DASHVECTOR_UPSERT_BATCH", "64"))
 
+# 并发写入（同时在途的 upsert 批次数）与失败重试
+UPSERT_CONCURRENCY = int(os.getenv("DASHVECTOR_UPSERT_CONCURRENCY", "8"))
+UPSERT_RETRIES = int(os.getenv("DASHVECTOR_UPSERT_RETRIES", "3"))
+# 只有这些错误码值得重试：SDK 把 gRPC / HTTP 失败原样透传为 code，其余（参数、维度、dtype 等）重试也不会成功
+_TRANSIENT_CODES = frozenset({
+    int(DashVectorCode.Timeout),
+    int(DashVectorCode.ExceedRateLimit),
+    grpc.StatusCode.DEADLINE_EXCEEDED.value[0],
+    grpc.StatusCode.RESOURCE_EXHAUSTED.value[0],
+    grpc.StatusCode.ABORTED.value[0],
+    grpc.StatusCode.INTERNAL.value[0],
+    grpc.StatusCode.UNAVAILABLE.value[0],
+    429, 500, 502, 503, 504,
+})
+
+# 批量 embedding（每次请求的文本条数）
+EMB_BATCH = int(os.getenv("EMB_BATCH_SIZE", "64"))
+
+# 单次构建内相同文本（模板化免责声明等）只 embedding 一次；缓存随 main() 结束释放
+EMB_CACHE_SIZE = int(os.getenv("EMB_CACHE_SIZE", "50000"))
+
 # Encoder 模式
 TRAIN_ENCODER = int(os.getenv("TRAIN_ENCODER", "0"))
 
@@ -62,61 +90,66 @@ META_DOC_ID_PREFIX = "__meta__#build_"
 def now_dt_str() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def parse_list_like(value: Any) -> str:
-    if pd.isna(value):
-        return ""
-    s = str(value).strip()
-    if not s:
-        return ""
-    try:
-        obj = ast.literal_eval(s)
-        if isinstance(obj, (list, tuple)):
-            return " ".join(map(str, obj))
-    except Exception:
-        pass
-    return s
-
-def normalize_text(field_name: str, value: Any) -> str:
+def l2_normalize(vecs: np.ndarray) -> np.ndarray:
+    """按行原地归一化 (B, D) 矩阵。"""
+    norms = np.sqrt(np.einsum("ij,ij->i", vecs, vecs))[:, None]
+    np.divide(vecs, norms, out=vecs, where=norms > 0)
+    return vecs
+
+def get_embeddings(texts: List[str], cache: Optional[LRUCache] = None) -> np.ndarray:
+    texts = [t or " " for t in texts]
+    found: Dict[str, np.ndarray] = {}
+    if cache is not None:
+        for t in texts:
+            if t not in found and t in cache:
+                found[t] = cache[t]
+
+    # 批内去重后只对未命中的文本请求 embedding
+    missing = [t for t in dict.fromkeys(texts) if t not in found]
+    if missing:
+        vecs = l2_normalize(np.ascontiguousarray(emb_call_batch(missing), dtype="float32"))
+        for t, vec in zip(missing, vecs):
+            found[t] = vec
+            if cache is not None:
+                cache[t] = vec
+
+    return np.stack([found[t] for t in texts])
+
+def column_str(df: pd.DataFrame, col: str) -> np.ndarray:
+    """按列取去首尾空白的字符串；列不存在时返回等长空串数组。"""
+    if col not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    return df[col].fillna("").astype(str).str.strip().to_numpy()
+
+def normalized_text_column(df: pd.DataFrame, field_name: str) -> pd.Series:
+    """整列归一化文本字段：labels/features 做 list 解析，其余缺失值转空串。"""
+    if field_name not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
     if field_name in ("labels", "features"):
-        return parse_list_like(value)
-    if pd.isna(value):
-        return ""
-    return str(value)
-
-def l2_normalize(vec: np.ndarray) -> np.ndarray:
-    norm = float(np.linalg.norm(vec))
-    if norm > 0:
-        return vec / norm
-    return vec
-
-def get_embedding(text: str) -> List[float]:
-    if not text:
-        text = " "
-    v = emb_call(text)
-    arr = np.array(v, dtype="float32")
-    arr = l2_normalize(arr)
-    return arr.tolist()
-
-def is_valid_text(text: str) -> bool:
-    if not text:
-        return False
-    return bool(str(text).strip())
+        return df[field_name].map(parse_list_like).astype(object)
+    return df[field_name].fillna("").astype(str).astype(object)
+
+def normalized_text_columns(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    """所有 TEXT_FIELDS 各归一化一次，供 encoder 训练与 doc 构建共用。"""
+    return {f: normalized_text_column(df, f) for f in TEXT_FIELDS}
 
-def build_encoder(df: pd.DataFrame) -> SparseVectorEncoder:
+def build_encoder(df: pd.DataFrame, norm_cols: Optional[Dict[str, pd.Series]] = None) -> SparseVectorEncoder:
     encoder = SparseVectorEncoder()
     encoder.load("./bm25_zh_default.json")
 
     if not TRAIN_ENCODER:
         return encoder
 
-    corpus: List[str] = []
-    for _, row in df.iterrows():
-        parts = []
-        for f in TEXT_FIELDS:
-            parts.append(normalize_text(f, row.get(f, "")))
-        doc = "\n".join([p for p in parts if is_valid_text(p)])
-        if is_valid_text(doc):
-            corpus.append(doc)
+    # 每个字段整列归一化一次，再按列拼接（跳过空字段），避免逐行 Python 循环
+    if norm_cols is None:
+        norm_cols = normalized_text_columns(df)
+
+    joined = pd.Series("", index=df.index, dtype=object)
+    for f in TEXT_FIELDS:
+        col = norm_cols[f]
+        joined += (col + "\n").where(col.str.strip().astype(bool), "")
+    joined = joined.str[:-1]
+    corpus: List[str] = joined[joined.str.strip().astype(bool)].tolist()
 
     if corpus:
         encoder.train(corpus)
@@ -127,14 +160,49 @@ def ensure_collection(client: dashvector.Client, dim: int) -> Any:
     col = client.get(COLLECTION_NAME)
     if not col:
         raise RuntimeError("collection created but cannot be fetched")
+
+    # 写入向量的精度必须与 collection 的 dtype 一致；describe 失败时无法校验，直接报错而不是跳过
+    rsp = client.describe(COLLECTION_NAME)
+    if not rsp:
+        raise RuntimeError(f"describe collection {COLLECTION_NAME} failed, cannot verify dtype: code={getattr(rsp, 'code', None)} message={getattr(rsp, 'message', '')}")
+    dtype = str(getattr(rsp.output, "dtype", "") or "").upper()
+    if dtype != collection_dtype():
+        raise RuntimeError(f"collection {COLLECTION_NAME} dtype={dtype or 'unknown'} does not match VECTOR_QUANTIZE (expects {collection_dtype()})")
     return col
 
+def _is_transient(code: Any) -> bool:
+    try:
+        return int(code) in _TRANSIENT_CODES
+    except (TypeError, ValueError):
+        return False
+
 def flush_upsert(collection: Any, docs: List[Doc]) -> None:
+    """写入一批 doc；超时、限流、服务不可用等瞬时错误按指数退避重试，其余错误立即抛出。"""
     if not docs:
         return
-    ret = collection.upsert(docs)
-    if not ret:
-        raise RuntimeError(f"upsert failed: {ret}")
+    code, message = None, ""
+    for attempt in range(UPSERT_RETRIES + 1):
+        try:
+            ret = collection.upsert(docs)
+        except DashVectorException as e:
+            code, message = e.code, e.message
+        except (ConnectionError, TimeoutError, grpc.RpcError) as e:
+            code, message = None, repr(e)
+        else:
+            if ret:
+                return
+            code, message = getattr(ret, "code", None), getattr(ret, "message", "")
+        if code is not None and not _is_transient(code):
+            raise RuntimeError(f"upsert failed: code={code} message={message}")
+        if attempt < UPSERT_RETRIES:
+            time.sleep(min(0.5 * (2 ** attempt), 8.0))
+    raise RuntimeError(f"upsert failed after {UPSERT_RETRIES + 1} attempts: code={code} message={message}")
+
+def submit_upsert(ex: ThreadPoolExecutor, in_flight: deque, collection: Any, docs: List[Doc]) -> None:
+    # 在途批次达到上限时先等最早的一批完成（背压，限制内存）
+    if len(in_flight) >= UPSERT_CONCURRENCY:
+        in_flight.popleft().result()
+    in_flight.append(ex.submit(flush_upsert, collection, docs))
 
 def build_meta_docs(
     dim: int,
@@ -145,7 +213,7 @@ def build_meta_docs(
     skipped_docs: int,
     row_count: int,
 ) -> List[Doc]:
-    zero_vec = [0.0] * dim
+    zero_vec = quantize_vectors(np.zeros(dim, dtype="float32"))
 
     base_fields = {
         "is_meta": 1,
@@ -180,13 +248,17 @@ def main():
     data_version = os.getenv("DATA_VERSION", "") or datetime.now().strftime("v%Y%m%d_%H%M%S")
 
     print(f"[Run] ingest_dt={ingest_dt} build_id={build_id} data_version={data_version}")
+    emb_cache: LRUCache = LRUCache(maxsize=EMB_CACHE_SIZE)
 
     print("[Main] 读取 SQL 结果集...")
     df = _load_dataframe(SQL)
     print(f"[Main] 共 {len(df)} 条产品记录。")
 
+    # 各文本字段整列归一化一次（labels/features 的 literal 解析只做一遍）
+    norm_cols = normalized_text_columns(df)
+
     print("[Main] 初始化 DashText SparseVectorEncoder...")
-    encoder = build_encoder(df)
+    encoder = build_encoder(df, norm_cols)
     print(f"[Main] Encoder ready. TRAIN_ENCODER={TRAIN_ENCODER}")
 
     print("[Main] 调用一次 emb_call 获取向量维度...")
@@ -195,7 +267,7 @@ def main():
     print(f"[Main] 向量维度: {dim}")
 
     print("[Main] 初始化 DashVector Client...")
-    client = dashvector.Client(api_key=DASHVECTOR_API_KEY, endpoint=DASHVECTOR_ENDPOINT)
+    client = get_client(DASHVECTOR_API_KEY, DASHVECTOR_ENDPOINT)
 
     print(f"[Main] 确保 Collection 存在：{COLLECTION_NAME}")
     collection = ensure_collection(client, dim)
@@ -205,33 +277,37 @@ def main():
     total_docs = 0
     skipped_docs = 0
 
-    has_channel_col = (COL_CHANNEL in df.columns)
-
-    for _, row in df.iterrows():
-        product_id = str(row.get(COL_PRODUCT_ID, "")).strip()
-        company = str(row.get(COL_COMPANY, "")).strip()
-        product_name = str(row.get(COL_PRODUCT_NAME, "")).strip()
-        track = str(row.get(COL_TRACK, "")).strip()
-        channel = str(row.get(COL_CHANNEL, "")).strip() if has_channel_col else ""
+    # 按列一次性取出，避免 iterrows 逐行构造 Series
+    pid_arr = column_str(df, COL_PRODUCT_ID)
+    company_arr = column_str(df, COL_COMPANY)
+    name_arr = column_str(df, COL_PRODUCT_NAME)
+    track_arr = column_str(df, COL_TRACK)
+    channel_arr = column_str(df, COL_CHANNEL)
+    text_arrs = {f: norm_cols[f].to_numpy() for f in TEXT_FIELDS}
+    valid_arrs = {f: norm_cols[f].str.strip().astype(bool).to_numpy() for f in TEXT_FIELDS}
+
+    # 先收集全部待写入的 (doc_id, fields)，再按 EMB_BATCH 批量 embedding
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+    for i in range(len(df)):
+        product_id = pid_arr[i]
+        company = company_arr[i]
+        product_name = name_arr[i]
+        track = track_arr[i]
+        channel = channel_arr[i]
 
         if not product_id:
             continue
 
+        # 空字段在 embedding 之前就跳过；同一产品的各字段进入同一批
         for field in TEXT_FIELDS:
-            raw_text = normalize_text(field, row.get(field, ""))
-            if not is_valid_text(raw_text):
+            if not valid_arrs[field][i]:
                 skipped_docs += 1
                 continue
+            raw_text = text_arrs[field][i]
 
-            doc_id = f"{product_id}#{field}"
-            dense = get_embedding(raw_text)
-            sparse = encoder.encode_documents(raw_text)
-
-            doc = Doc(
-                id=doc_id,
-                vector=dense,
-                sparse_vector=sparse,
-                fields={
+            pending.append((
+                f"{product_id}#{field}",
+                {
                     "product_id": product_id,
                     "company": company,
                     "channel": channel,
@@ -244,17 +320,38 @@ def main():
                     "data_version": data_version,
                     "is_meta": 0,
                 },
-            )
-            buffer.append(doc)
-            total_docs += 1
-
-            if len(buffer) >= BATCH_DOCS:
-                flush_upsert(collection, buffer)
-                print(f"[Upsert] 已写入 {total_docs} docs...")
-                buffer = []
-
-    if buffer:
-        flush_upsert(collection, buffer)
+            ))
+
+    print(f"[Main] 待写入 {len(pending)} docs，按 {EMB_BATCH} 条/批 调用 embedding...")
+    in_flight: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=UPSERT_CONCURRENCY) as ex:
+        for start in range(0, len(pending), EMB_BATCH):
+            chunk = pending[start:start + EMB_BATCH]
+            texts = [fields["text"] for _, fields in chunk]
+            dense = quantize_vectors(get_embeddings(texts, emb_cache))
+            sparse = encoder.encode_documents(texts)
+
+            for (doc_id, fields), vec, sp in zip(chunk, dense, sparse):
+                buffer.append(Doc(
+                    id=doc_id,
+                    vector=vec,
+                    sparse_vector=sp,
+                    fields=fields,
+                ))
+                total_docs += 1
+
+                if len(buffer) >= BATCH_DOCS:
+                    submit_upsert(ex, in_flight, collection, buffer)
+                    print(f"[Upsert] 已提交 {total_docs} docs...")
+                    buffer = []
+
+        if buffer:
+            submit_upsert(ex, in_flight, collection, buffer)
+
+        # 全部数据写完后再更新 meta doc
+        while in_flight:
+            in_flight.popleft().result()
 
     meta_docs = build_meta_docs(
         dim=dim,
@@ -4,9 +4,14 @@ import os
 DASHVECTOR_API_KEY_ = os.getenv("DASHVECTOR_API_KEY", "xxx")
 DASHVECTOR_ENDPOINT_ = os.getenv("DASHVECTOR_ENDPOINT", "xxx")
 DASHVECTOR_COLLECTION_ = os.getenv("DASHVECTOR_COLLECTION", "competitor_products_dev")
+DASHVECTOR_TIMEOUT = float(os.getenv("DASHVECTOR_TIMEOUT", "10"))
+# Stored vector precision: off (float32) | int8; must match the collection dtype
+VECTOR_QUANTIZE = os.getenv("VECTOR_QUANTIZE", "off").strip().lower()
 
 # Index meta doc id
 META_DOC_ID_LATEST = os.getenv("DASHVECTOR_META_LATEST_ID", "__meta__#latest")
+# Seconds /v1/index/status may serve a cached meta doc; bounds staleness in workers that did not run the build
+META_CACHE_TTL = float(os.getenv("META_CACHE_TTL", "30"))
 
 # SQL query file path used by retrieval and batch parse
 SQL_QUERY_PATH = os.getenv("SQL_QUERY_PATH", "sql_test.txt")
@@ -14,3 +19,5 @@ SQL_QUERY_PATH = os.getenv("SQL_QUERY_PATH", "sql_test.txt")
 # Logging
 LOG_DIR = os.getenv("LOG_DIR", "./logs")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# uvicorn worker processes; above 1 the log files must be rotated externally (logrotate)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
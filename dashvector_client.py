@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import dashvector
+from cachetools import TTLCache
+from dashvector import DashVectorProtocol
+
+from competitors_searcher.configs.settings import DASHVECTOR_TIMEOUT, META_CACHE_TTL, VECTOR_QUANTIZE
+
+# VECTOR_QUANTIZE -> collection dtype (DashVector only stores float32 or int8)
+_QUANTIZE_DTYPES = {"off": "FLOAT", "int8": "INT"}
+
+_clients: Dict[Tuple[str, str], dashvector.Client] = {}
+_clients_lock = threading.Lock()
+
+# Latest index meta doc. Only the process that ran a build can invalidate it,
+# so the TTL stays short: other API workers lag by at most META_CACHE_TTL.
+# TTLCache is not thread-safe and is shared by handler threads and build threads.
+_meta_cache = TTLCache(maxsize=16, ttl=META_CACHE_TTL)
+_meta_cache_lock = threading.Lock()
+
+def meta_cache_get(key: str) -> Optional[Any]:
+    with _meta_cache_lock:
+        return _meta_cache.get(key)
+
+def meta_cache_put(key: str, value: Any) -> None:
+    with _meta_cache_lock:
+        _meta_cache[key] = value
+
+def invalidate_meta_cache() -> None:
+    with _meta_cache_lock:
+        _meta_cache.clear()
+
+def get_client(api_key: str, endpoint: str) -> dashvector.Client:
+    """Return the process-wide DashVector client for (api_key, endpoint).
+
+    The gRPC transport multiplexes concurrent calls over one HTTP/2 channel,
+    so API requests, retrieval and index upserts all share a single client.
+    """
+    key = (api_key, endpoint)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = dashvector.Client(
+                api_key=api_key,
+                endpoint=endpoint,
+                timeout=DASHVECTOR_TIMEOUT,
+                protocol=DashVectorProtocol.GRPC,
+            )
+            # a failed Client is falsy; don't pin it, retry on next call
+            if client:
+                _clients[key] = client
+    return client
+
+def collection_dtype() -> str:
+    """Collection dtype required by VECTOR_QUANTIZE."""
+    try:
+        return _QUANTIZE_DTYPES[VECTOR_QUANTIZE]
+    except KeyError:
+        raise RuntimeError(f"unsupported VECTOR_QUANTIZE={VECTOR_QUANTIZE!r}, expected one of {sorted(_QUANTIZE_DTYPES)}")
+
+def quantize_vectors(vecs: np.ndarray) -> np.ndarray:
+    """Cast L2-normalised float32 vectors (any shape) to the stored dtype."""
+    if collection_dtype() == "INT":
+        return np.rint(vecs * 127.0).clip(-127, 127).astype(np.int8)
+    return vecs
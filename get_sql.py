@@ -1,19 +1,53 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
 import os
 import pandas as pd
 
 _DEV_SOURCE_CSV = os.getenv("DEV_SOURCE_CSV", "")
 _DEV_SINK_CSV = os.getenv("DEV_SINK_CSV", "parsed_output.csv")
 
-def _load_dataframe(sql: str) -> pd.DataFrame:
-    if _DEV_SOURCE_CSV and os.path.exists(_DEV_SOURCE_CSV):
-        return pd.read_csv(_DEV_SOURCE_CSV)
+def _empty_dataframe() -> pd.DataFrame:
     return pd.DataFrame(columns=[
         "product_id","company","product_name","channel","track","summary",
         "labels","features","summary_coverage","summary_liability",
         "summary_exclusions","summary_provisions","summary_services",
     ])
 
-def write_dataframe_replace(df: pd.DataFrame, table_name: Optional[str] = None) -> None:
-    df.to_csv(_DEV_SINK_CSV, index=False, encoding="utf_8_sig")
+def _iter_dataframe_chunks(sql: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    if _DEV_SOURCE_CSV and os.path.exists(_DEV_SOURCE_CSV):
+        yield from pd.read_csv(_DEV_SOURCE_CSV, chunksize=chunksize)
+        return
+    yield _empty_dataframe()
+
+def _load_dataframe(sql: str, chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """Load the SQL result set; with ``chunksize`` return an iterator of chunks instead."""
+    if chunksize:
+        return _iter_dataframe_chunks(sql, chunksize)
+    if _DEV_SOURCE_CSV and os.path.exists(_DEV_SOURCE_CSV):
+        return pd.read_csv(_DEV_SOURCE_CSV)
+    return _empty_dataframe()
+
+def write_dataframe_chunks_replace(chunks: Iterable[pd.DataFrame], table_name: Optional[str] = None) -> int:
+    """Stream chunks into a staging target, then swap it in so readers never see a partial table."""
+    tmp_path = f"{_DEV_SINK_CSV}.tmp"
+    rows = 0
+    first = True
+    try:
+        for chunk in chunks:
+            chunk.to_csv(
+                tmp_path,
+                mode="w" if first else "a",
+                header=first,
+                index=False,
+                encoding="utf_8_sig" if first else "utf-8",
+            )
+            first = False
+            rows += len(chunk)
+        if first:
+            open(tmp_path, "w", encoding="utf_8_sig").close()
+        os.replace(tmp_path, _DEV_SINK_CSV)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
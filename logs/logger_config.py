@@ -1,14 +1,22 @@
 # -*- coding: utf-8 -*-
+import atexit
+import copy
 import json
 import logging
 import os
+import queue
 import sys
 from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler, WatchedFileHandler
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-from competitors_searcher.configs.settings import LOG_DIR, LOG_LEVEL
+from competitors_searcher.configs.settings import LOG_DIR, LOG_LEVEL, WEB_CONCURRENCY
+
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json
+    orjson = None
 
 def _ensure_log_dir() -> Path:
     p = Path(LOG_DIR)
@@ -16,6 +24,11 @@ def _ensure_log_dir() -> Path:
     return p
 
 def _json_dumps_safe(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except Exception:
+            pass  # e.g. ints wider than 64 bits or mixed key types; stdlib json copes with those
     try:
         return json.dumps(obj, ensure_ascii=False, default=str)
     except Exception:
@@ -28,7 +41,7 @@ def _kv(event: str, payload: Dict[str, Any]) -> str:
 class JsonLikeFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         base = {
-            "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ts": datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S"),
             "level": record.levelname,
             "logger": record.name,
             "msg": record.getMessage(),
@@ -39,10 +52,28 @@ class JsonLikeFormatter(logging.Formatter):
             base.update(extra)
         if record.exc_info:
             base["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            base["exc_info"] = record.exc_text
         return _json_dumps_safe(base)
 
+class _RecordQueueHandler(QueueHandler):
+    """Enqueue records unformatted; the listener's handlers do the formatting."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        # traceback objects can't outlive the caller's frame; render them here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 def get_logger(name: str = "app") -> logging.Logger:
-    """Create/reuse a logger that logs to both console and file in ./logs."""
+    """Create/reuse a logger that logs to both console and file in ./logs.
+
+    Records are handed to a background QueueListener, so callers never block on disk I/O.
+    """
     logger = logging.getLogger(name)
     if getattr(logger, "_configured", False):
         return logger
@@ -56,13 +87,18 @@ def get_logger(name: str = "app") -> logging.Logger:
     fmt = JsonLikeFormatter()
 
 
-    fh = TimedRotatingFileHandler(
-        filename=log_file,
-        when="D",
-        interval=1,
-        backupCount=14,
-        encoding="utf-8",
-    )
+    if WEB_CONCURRENCY > 1:
+        # several workers append to the same file; in-process rotation would rename it
+        # under the others, so rotate externally and just reopen when the file moves
+        fh = WatchedFileHandler(filename=log_file, encoding="utf-8")
+    else:
+        fh = TimedRotatingFileHandler(
+            filename=log_file,
+            when="D",
+            interval=1,
+            backupCount=14,
+            encoding="utf-8",
+        )
     fh.setFormatter(fmt)
     fh.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
 
@@ -71,10 +107,14 @@ def get_logger(name: str = "app") -> logging.Logger:
     sh.setFormatter(fmt)
     sh.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
 
-    logger.addHandler(fh)
-    logger.addHandler(sh)
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(q, fh, sh, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(_RecordQueueHandler(q))
 
     logger._configured = True
     return logger
 
-__all__ = ["get_logger", "_kv"]
+__all__ = ["get_logger", "_kv", "_json_dumps_safe"]
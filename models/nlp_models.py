@@ -1,10 +1,21 @@
+import hashlib
 from typing import Any, Dict, List
 import numpy as np
 
+_EMB_DIM = 1024
+
+def _text_seed(text: str) -> int:
+    # stable across processes (hash() is salted), so index-time and query-time vectors agree
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
 def emb_call(text: str) -> List[float]:
-    rs = np.random.RandomState(abs(hash(text)) % (2**32))
-    v = rs.normal(size=(1024,)).astype("float32")
-    return v.tolist()
+    return emb_call_batch([text])[0].tolist()
+
+def emb_call_batch(texts: List[str]) -> np.ndarray:
+    out = np.empty((len(texts), _EMB_DIM), dtype=np.float32)
+    for row, text in zip(out, texts):
+        np.random.default_rng(_text_seed(text)).standard_normal(dtype=np.float32, out=row)
+    return out
 
 def rerank_call(user_query: str, documents: List[str], model_name: str = "qwen3-rerank", top_k: int = 100) -> List[Dict[str, Any]]:
     out = []
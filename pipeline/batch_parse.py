@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
+import os
 import threading
 import uuid
 import json
 import ast
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
 import pandas as pd
 
 from competitors_searcher.parser import generate_results
-from competitors_searcher.get_sql import _load_dataframe, write_dataframe_replace
+from competitors_searcher.get_sql import _load_dataframe, write_dataframe_chunks_replace
 from competitors_searcher.logs.logger_config import get_logger
+from competitors_searcher.dashvector_client import invalidate_meta_cache
+from competitors_searcher.text_utils import json_loads
 import competitors_searcher.build_dashvector_indices as index_builder
 
 logger = get_logger("batch_parse")
@@ -18,6 +22,12 @@ logger = get_logger("batch_parse")
 _TASKS: Dict[str, Dict[str, Any]] = {}
 _TASK_LOCK = threading.Lock()
 
+# 分块读取 + 并发解析
+PARSE_CHUNK_SIZE = int(os.getenv("PARSE_CHUNK_SIZE", "1000"))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "8"))
+
+_STRIP_QUOTES = str.maketrans("", "", "'\"")
+
 LIST_KEYS = ["labels", "features"]
 SUMMARY_TEXT_KEYS = [
     "summary_coverage",
@@ -34,6 +44,7 @@ def _ensure_dict(res: Any) -> Dict[str, Any]:
     if isinstance(res, dict):
         return res
     if isinstance(res, str):
+        # stdlib json：orjson 会把超出 64 位的整数静默转成 float，解析结果要与上游输出逐位一致
         try:
             return json.loads(res)
         except Exception:
@@ -45,22 +56,24 @@ def _coerce_to_list(maybe_list) -> List[str]:
         return [x for x in maybe_list if isinstance(x, str) and x]
     if isinstance(maybe_list, str):
         raw = maybe_list.strip()
-        # json list
-        try:
-            val = json.loads(raw)
-            if isinstance(val, list):
-                return [x for x in val if isinstance(x, str) and x]
-        except Exception:
-            pass
-        # python literal list
-        try:
-            val = ast.literal_eval(raw)
-            if isinstance(val, list):
-                return [x for x in val if isinstance(x, str) and x]
-        except Exception:
-            pass
+        # only bracketed text can parse as a list; skip both parsers otherwise
+        if raw[:1] == "[":
+            # json list
+            try:
+                val = json_loads(raw)
+                if isinstance(val, list):
+                    return [x for x in val if isinstance(x, str) and x]
+            except ValueError:
+                pass
+            # python literal list (single-quoted)
+            try:
+                val = ast.literal_eval(raw)
+                if isinstance(val, list):
+                    return [x for x in val if isinstance(x, str) and x]
+            except Exception:
+                pass
         # fallback split
-        txt = raw.strip("[]").replace("'", "").replace('"', "")
+        txt = raw.strip("[]").translate(_STRIP_QUOTES)
         return [p.strip() for p in txt.split(",") if p.strip()]
     return []
 
@@ -115,40 +128,45 @@ def _fail_task(task_id: str, error: str):
             _TASKS[task_id]["finished_at"] = _now()
             _TASKS[task_id]["error"] = error
 
+def _parse_text(text: str) -> Dict[str, Any]:
+    try:
+        res = generate_results(text)
+        data = _ensure_dict(res)
+        return _extract_fields(data)
+    except Exception:
+        fields: Dict[str, Any] = {k: [] for k in LIST_KEYS}
+        fields.update({k: "" for k in SUMMARY_TEXT_KEYS})
+        return fields
+
+def _parse_chunks(chunks: Iterator[pd.DataFrame], ex: ThreadPoolExecutor, create_time: str) -> Iterator[pd.DataFrame]:
+    for df in chunks:
+        text_col = "summary" if "summary" in df.columns else ("product_text" if "product_text" in df.columns else None)
+        if not text_col:
+            raise RuntimeError("Input DataFrame missing text column: expected 'summary' or 'product_text'")
+
+        rows = list(ex.map(_parse_text, df[text_col].fillna("").astype(str).tolist()))
+        parsed_df = pd.DataFrame(rows)
+        final_df = pd.concat([df.reset_index(drop=True), parsed_df], axis=1)
+        final_df["create_time"] = create_time
+        yield final_df
+
 def _run_parse_job():
     logger.info("[Pipeline] Step1: parse batch start")
     sql_path = "sql_test.txt"
     with open(sql_path, "r", encoding="utf-8") as f:
         sql = f.read()
-    df = _load_dataframe(sql)
-
-    rows = []
-    text_col = "summary" if "summary" in df.columns else ("product_text" if "product_text" in df.columns else None)
-    if not text_col:
-        raise RuntimeError("Input DataFrame missing text column: expected 'summary' or 'product_text'")
-
-    for text in df[text_col].fillna("").astype(str).tolist():
-        try:
-            res = generate_results(text)
-            data = _ensure_dict(res)
-            fields = _extract_fields(data)
-        except Exception:
-            fields = {k: [] for k in LIST_KEYS}
-            fields.update({k: "" for k in SUMMARY_TEXT_KEYS})
-        rows.append(fields)
-
-    parsed_df = pd.DataFrame(rows)
-    final_df = pd.concat([df.reset_index(drop=True), parsed_df], axis=1)
-    final_df["create_time"] = _now()
 
     logger.info("[Pipeline] writing parsed results to SQL (replace)")
-    write_dataframe_replace(final_df)
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as ex:
+        chunks = _load_dataframe(sql, chunksize=PARSE_CHUNK_SIZE)
+        row_count = write_dataframe_chunks_replace(_parse_chunks(chunks, ex, _now()))
 
-    logger.info("[Pipeline] Step1: parse batch done")
+    logger.info(f"[Pipeline] Step1: parse batch done, rows={row_count}")
 
 def _run_index_job():
     logger.info("[Pipeline] Step2: build dashvector index start")
     index_builder.main()
+    invalidate_meta_cache()
     logger.info("[Pipeline] Step2: build dashvector index done")
 
 def _pipeline_runner(task_id: str):
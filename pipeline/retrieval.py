@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
-import json
-import ast
+import atexit
+import hashlib
+import inspect
+import threading
 from datetime import datetime
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterable, List, Tuple, Optional
 from collections import defaultdict
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
@@ -14,18 +17,28 @@ from cachetools import TTLCache
 import dashvector
 from dashtext import SparseVectorEncoder
 
+from competitors_searcher.dashvector_client import get_client, quantize_vectors
 from competitors_searcher.models.nlp_models import emb_call, rerank_call
 from competitors_searcher.parser import generate_results
 from competitors_searcher.get_sql import _load_dataframe
+from competitors_searcher.text_utils import parse_list_like
 
 # ========================
 # 缓存配置
 # ========================
 _search_cache = TTLCache(maxsize=20000, ttl=7200)
-_dv_result_cache: Dict[Tuple[str, str, str, int, str, str], List[Dict[str, Any]]] = {}
+_dv_result_cache = TTLCache(maxsize=50000, ttl=1800)
+_dv_result_lock = threading.Lock()  # TTLCache 非线程安全，检索线程池与请求线程并发读写
 _df_cache = TTLCache(maxsize=2, ttl=600)
 _meta_cache = TTLCache(maxsize=4, ttl=60)
 
+# 进程级线程池：预取编码、逐字段检索回退与分批 rerank 共用，避免每个请求新建/销毁线程
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="dv")
+atexit.register(_SEARCH_EXECUTOR.shutdown)
+# 投机解析单独的小线程池：df 回源期间最多并发 2 个 generate_results，不占用检索线程
+_SPECULATIVE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+atexit.register(_SPECULATIVE_EXECUTOR.shutdown)
+
 # ========================
 # 配置
 # ========================
@@ -38,6 +51,8 @@ DASHVECTOR_API_KEY = "xxx"
 DASHVECTOR_ENDPOINT = "xxx"
 
 META_DOC_ID_LATEST = "__meta__#latest"
+META_CACHE_KEY = "latest"
+DF_CACHE_KEY = "df"
 
 COL_PRODUCT_ID = "product_id"
 COL_COMPANY = "company"
@@ -45,6 +60,14 @@ COL_CHANNEL = "channel"
 COL_PRODUCT_NAME = "product_name"
 COL_TRACK = "track"
 
+# _get_df_indexed 预计算的列：过滤用（去首尾空白）、候选输出用字符串、归一化字段文本与拼接文本
+COL_COMPANY_NORM = "_company"
+COL_CHANNEL_NORM = "_channel"
+COL_PRODUCT_NAME_STR = "_product_name"
+COL_TRACK_STR = "_track"
+COL_COMBINED_TEXT = "_combined_text"
+NORM_FIELD_PREFIX = "_norm_"
+
 TEXT_FIELDS = [
     "labels",
     "features",
@@ -56,9 +79,12 @@ TEXT_FIELDS = [
 ]
 
 TOP_K_DASHVECTOR_PER_FIELD = 80
+DV_OUTPUT_FIELDS = ["product_id", "company", "channel", "product_name", "track", "field", "ingest_dt", "build_id", "data_version"]
 RRF_K = 60.0
 MAX_CANDIDATES_FOR_RERANK = 100
+RRF_OVERSAMPLE = 5  # RRF 只保留前 MAX_CANDIDATES_FOR_RERANK * 5，为后续过滤淘汰留余量
 DEFAULT_RERANK_THRESHOLD = 0.3
+RERANK_BATCH_SIZE = 32
 
 # ========================
 # 工具
@@ -90,20 +116,6 @@ def _wrap_response_fail(detail: Dict[str, Any], biz_dt: str, fail_cause: str) ->
         "detail": detail,
     }
 
-def parse_list_like(value: Any) -> str:
-    if value is None or (isinstance(value, float) and np.isnan(value)):
-        return ""
-    s = str(value).strip()
-    if not s:
-        return ""
-    try:
-        obj = ast.literal_eval(s)
-        if isinstance(obj, (list, tuple)):
-            return " ".join(map(str, obj))
-    except Exception:
-        pass
-    return s
-
 def normalize_field_text(field_name: str, value: Any) -> str:
     if field_name in ("labels", "features"):
         return parse_list_like(value)
@@ -111,32 +123,29 @@ def normalize_field_text(field_name: str, value: Any) -> str:
         return ""
     return str(value)
 
+@lru_cache(maxsize=8192)
+def _emb_cached(text: str) -> bytes:
+    # 以不可变 bytes 缓存，同一文本（多字段重复的 query、meta 兜底查询）只请求一次 embedding
+    arr = np.asarray(emb_call(text), dtype=np.float32)
+    n = float(np.dot(arr, arr)) ** 0.5
+    if n > 0 and abs(n - 1.0) > 1e-6:
+        arr = arr / n
+    return arr.tobytes()
+
 def get_embedding(text: str) -> np.ndarray:
+    """返回 L2 归一化的 float32 向量（只读，调用方不要原地修改）。"""
     if not text:
         text = " "
-    vec = emb_call(text)
-    arr = np.array(vec, dtype="float32")
-    norm = np.linalg.norm(arr)
-    if norm > 0:
-        arr = arr / norm
-    return arr
-
-def build_combined_text_from_fields_map(fields_map: Dict[str, Any]) -> str:
-    parts: List[str] = []
-    for field in TEXT_FIELDS:
-        val = normalize_field_text(field, fields_map.get(field, ""))
-        if val:
-            parts.append(val)
-    return "。".join(parts)
+    return np.frombuffer(_emb_cached(text), dtype=np.float32)
+
+def join_normalized_fields(values: Iterable[str]) -> str:
+    return "。".join(v for v in values if v)
 
 def _norm_str_list(items: Optional[List[str]]) -> List[str]:
     if not items:
         return []
     return [str(x).strip() for x in items if str(x).strip()]
 
-def _list_cache_key(items: List[str]) -> str:
-    return "|".join(sorted(items))
-
 def _sql_quote(s: str) -> str:
     return "'" + s.replace("'", "''") + "'"
 
@@ -153,7 +162,7 @@ def _get_collection():
         return _dv_collection
     if not DASHVECTOR_API_KEY or not DASHVECTOR_ENDPOINT:
         raise RuntimeError("请先设置 DASHVECTOR_API_KEY 和 DASHVECTOR_ENDPOINT")
-    _dv_client = dashvector.Client(api_key=DASHVECTOR_API_KEY, endpoint=DASHVECTOR_ENDPOINT)
+    _dv_client = get_client(DASHVECTOR_API_KEY, DASHVECTOR_ENDPOINT)
     _dv_collection = _dv_client.get(name=DASHVECTOR_COLLECTION)
     if not _dv_collection:
         raise RuntimeError(f"DashVector collection not found: {DASHVECTOR_COLLECTION}")
@@ -166,8 +175,29 @@ def _get_sparse_encoder() -> SparseVectorEncoder:
         _sparse_encoder.load("./bm25_zh_default.json")
     return _sparse_encoder
 
+# 同一 query 文本在多个字段间常会重复（labels/features 归一化后经常相同），按文本缓存稀疏编码；dense 由 get_embedding 缓存
+@lru_cache(maxsize=4096)
+def _cached_sparse(text: str) -> Dict[int, float]:
+    return _get_sparse_encoder().encode_queries(text)
+
+# 分数属性名按 doc 类型探测一次并缓存，之后直接 getattr，不再逐个 hasattr
+_DOC_SCORE_ATTRS = ("score", "_score", "distance")
+_doc_score_attr: Dict[type, Optional[str]] = {}
+
 def _extract_score(doc: Any) -> float:
-    for attr in ("score", "_score", "distance"):
+    cls = type(doc)
+    if cls not in _doc_score_attr:
+        _doc_score_attr[cls] = next((a for a in _DOC_SCORE_ATTRS if hasattr(doc, a)), None)
+    attr = _doc_score_attr[cls]
+    if attr is not None:
+        try:
+            return float(getattr(doc, attr))
+        except Exception:
+            pass
+    return _extract_score_slow(doc)
+
+def _extract_score_slow(doc: Any) -> float:
+    for attr in _DOC_SCORE_ATTRS:
         if hasattr(doc, attr):
             try:
                 return float(getattr(doc, attr))
@@ -176,16 +206,29 @@ def _extract_score(doc: Any) -> float:
     return 0.0
 
 def _safe_get_fields(doc: Any) -> Dict[str, Any]:
+    """返回只读的字段 dict；SDK 的 Doc.fields 本身就是 dict，直接返回不再拷贝。"""
+    fields = getattr(doc, "fields", None)
+    if type(fields) is dict:
+        return fields
     try:
-        return dict(getattr(doc, "fields", {}) or {})
+        return dict(fields or {})
     except Exception:
         return {}
 
 # ========================
 # biz_dt：从 DashVector meta doc 获取
 # ========================
+_ZERO_VEC: Optional[np.ndarray] = None
+
+def _zero_query_vector() -> np.ndarray:
+    """meta 兜底查询用的零向量；维度在首次调用时由一次 embedding 得到，之后复用。"""
+    global _ZERO_VEC
+    if _ZERO_VEC is None:
+        _ZERO_VEC = np.zeros(get_embedding("x").shape[0], dtype="float32")
+    return _ZERO_VEC
+
 def _get_biz_dt_from_dashvector() -> Tuple[str, List[str]]:
-    cache_key = "latest"
+    cache_key = META_CACHE_KEY
     if cache_key in _meta_cache:
         return _meta_cache[cache_key]
 
@@ -204,7 +247,7 @@ def _get_biz_dt_from_dashvector() -> Tuple[str, List[str]]:
 
         if meta_doc is None:
             # fallback to query by filter
-            qvec = np.zeros((get_embedding("x").shape[0],), dtype="float32")
+            qvec = quantize_vectors(_zero_query_vector())
             ret = col.query(
                 vector=qvec,
                 topk=1,
@@ -234,21 +277,71 @@ def _get_biz_dt_from_dashvector() -> Tuple[str, List[str]]:
 # ========================
 # SQL DF 缓存
 # ========================
-def _get_df() -> pd.DataFrame:
-    key = "df"
+def _get_df_indexed() -> Tuple[pd.DataFrame, Dict[Any, int]]:
+    """返回缓存的 DataFrame 及 product_id -> 行位置 的字典（二者同批构建，保证一致）。"""
+    key = DF_CACHE_KEY
     if key in _df_cache:
         return _df_cache[key]
     df = _load_dataframe(SQL)
     if df.index.name != COL_PRODUCT_ID and COL_PRODUCT_ID in df.columns:
         df = df.set_index(COL_PRODUCT_ID)
-    _df_cache[key] = df
-    return df
+    # positional lookups (pid_to_iloc) need a unique index; keep the first row per product
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep="first")].copy()
+    df[COL_COMPANY_NORM] = _column_values(df, COL_COMPANY, strip=True)
+    df[COL_CHANNEL_NORM] = _column_values(df, COL_CHANNEL, strip=True)
+    df[COL_PRODUCT_NAME_STR] = _column_values(df, COL_PRODUCT_NAME, as_str=True)
+    df[COL_TRACK_STR] = _column_values(df, COL_TRACK, as_str=True)
+
+    # 归一化（含 labels/features 的 literal 解析）在缓存周期内只做一次，而不是每次查询每个候选
+    combined = pd.Series("", index=df.index, dtype=object)
+    for field in TEXT_FIELDS:
+        if field in df.columns:
+            norm = df[field].map(lambda v, f=field: normalize_field_text(f, v)).astype(object)
+        else:
+            norm = pd.Series("", index=df.index, dtype=object)
+        df[NORM_FIELD_PREFIX + field] = norm
+        combined += (norm + "。").where(norm != "", "")
+    df[COL_COMBINED_TEXT] = combined.str[:-1]
+    pid_to_iloc = {pid: i for i, pid in enumerate(df.index)}
+    _df_cache[key] = (df, pid_to_iloc)
+    return df, pid_to_iloc
+
+def _column_values(df: pd.DataFrame, col: str, as_str: bool = False, strip: bool = False) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    s = df[col]
+    if as_str or strip:
+        s = s.map(str)
+    if strip:
+        s = s.str.strip()
+    return s.to_numpy(dtype=object)
 
 def _get_product_row(product_id: str) -> pd.Series:
-    df = _get_df()
-    if product_id not in df.index:
+    df, pid_to_iloc = _get_df_indexed()
+    i = pid_to_iloc.get(product_id)
+    if i is None:
         raise KeyError(f"product_id={product_id} not found")
-    return df.loc[product_id]
+    return df.iloc[i]
+
+def _rows_by_pids(
+    df: pd.DataFrame,
+    pid_to_iloc: Dict[Any, int],
+    pids: List[str],
+    allow_company: Optional[List[str]] = None,
+    allow_channel: Optional[List[str]] = None,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """按 pids 顺序一次 iloc 取行；跳过不存在或公司/渠道不在允许列表的，返回子表及保留下来的 pids 下标。
+
+    过滤只在候选所在行上用 np.isin 做，不再对整表求 mask。
+    """
+    positions = np.fromiter((pid_to_iloc.get(pid, -1) for pid in pids), dtype=np.intp, count=len(pids))
+    keep = positions >= 0
+    for col, allow in ((COL_COMPANY_NORM, allow_company), (COL_CHANNEL_NORM, allow_channel)):
+        if allow:
+            keep[keep] = np.isin(df[col].to_numpy()[positions[keep]], allow)
+    kept = np.flatnonzero(keep)
+    return df.iloc[positions[kept]], kept
 
 # ========================
 # DashVector 检索
@@ -270,9 +363,8 @@ def _dashvector_search(field: str, track: str, query_text: str, top_k: int, sele
     if not query_text.strip():
         return []
     collection = _get_collection()
-    encoder = _get_sparse_encoder()
-    qvec = get_embedding(query_text).astype("float32")
-    q_sparse = encoder.encode_queries(query_text)
+    qvec = quantize_vectors(get_embedding(query_text))
+    q_sparse = _cached_sparse(query_text)
 
     flt = _build_filter(track=track, field=field, selected_company=selected_company, selected_channel=selected_channel)
     ret = collection.query(
@@ -280,12 +372,14 @@ def _dashvector_search(field: str, track: str, query_text: str, top_k: int, sele
         sparse_vector=q_sparse,
         topk=int(top_k),
         filter=flt,
-        output_fields=["product_id", "company", "channel", "product_name", "track", "field", "ingest_dt", "build_id", "data_version"],
+        output_fields=DV_OUTPUT_FIELDS,
         include_vector=False,
     )
+    return _docs_to_results(ret)
+
+def _docs_to_results(ret: Any) -> List[Dict[str, Any]]:
     if not ret:
         return []
-
     results: List[Dict[str, Any]] = []
     for doc in ret:
         fields = _safe_get_fields(doc)
@@ -298,29 +392,126 @@ def _dashvector_search(field: str, track: str, query_text: str, top_k: int, sele
         results.append({"product_id": pid, "score": _extract_score(doc)})
     return results
 
+def _dv_cache_key(field: str, track: str, query_text: str, top_k: int, selected_company: List[str], selected_channel: List[str]) -> Tuple[Any, ...]:
+    return (field, track, query_text, int(top_k), tuple(sorted(selected_company)), tuple(sorted(selected_channel)))
+
+def _dv_cache_get(key: Tuple[Any, ...]) -> Optional[List[Dict[str, Any]]]:
+    with _dv_result_lock:
+        return _dv_result_cache.get(key)
+
+def _dv_cache_put(key: Tuple[Any, ...], res: List[Dict[str, Any]]) -> None:
+    with _dv_result_lock:
+        _dv_result_cache[key] = res
+
 def _dashvector_search_cached(field: str, track: str, query_text: str, top_k: int, selected_company: List[str], selected_channel: List[str]) -> List[Dict[str, Any]]:
-    ckey = _list_cache_key(selected_company)
-    chkey = _list_cache_key(selected_channel)
-    key = (field, track, query_text, int(top_k), ckey, chkey)
-    if key in _dv_result_cache:
-        return _dv_result_cache[key]
+    key = _dv_cache_key(field, track, query_text, top_k, selected_company, selected_channel)
+    res = _dv_cache_get(key)
+    if res is not None:
+        return res
     res = _dashvector_search(field, track, query_text, top_k, selected_company, selected_channel)
-    _dv_result_cache[key] = res
+    _dv_cache_put(key, res)
     return res
 
+@lru_cache(maxsize=8)
+def _supports_async_query(collection_type: type) -> bool:
+    """query() 是否接受 async_req；按 collection 类型只反射一次，不在每次请求上做 inspect。"""
+    return "async_req" in inspect.signature(collection_type.query).parameters
+
+def _dashvector_batch_search(fields: List[str], track: str, query_texts: Dict[str, str], top_k: int, selected_company: List[str], selected_channel: List[str]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """多字段检索一次性发出：SDK 没有 batch_query，用 async_req 在同一 gRPC 通道上流水线提交，再统一取回。
+
+    SDK 不支持 async_req 时返回 None，由调用方回退到逐字段检索；单个字段失败只丢弃该字段。
+    """
+    collection = _get_collection()
+    if not _supports_async_query(type(collection)):
+        return None
+
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    pending: List[Tuple[str, Tuple[Any, ...], Any]] = []
+    for field in fields:
+        qtext = query_texts[field]
+        key = _dv_cache_key(field, track, qtext, top_k, selected_company, selected_channel)
+        cached = _dv_cache_get(key)
+        if cached is not None:
+            out[field] = cached
+            continue
+        try:
+            rsp = collection.query(
+                vector=quantize_vectors(get_embedding(qtext)),
+                sparse_vector=_cached_sparse(qtext),
+                topk=int(top_k),
+                filter=_build_filter(track=track, field=field, selected_company=selected_company, selected_channel=selected_channel),
+                output_fields=DV_OUTPUT_FIELDS,
+                include_vector=False,
+                async_req=True,
+            )
+        except Exception:
+            continue
+        pending.append((field, key, rsp))
+
+    for field, key, rsp in pending:
+        try:
+            res = _docs_to_results(rsp.get())
+            _dv_cache_put(key, res)
+        except Exception:
+            continue
+        out[field] = res
+    return out
+
+# ========================
+# Rerank
+# ========================
+def _rerank_scores(query_text: str, doc_texts: List[str]) -> Dict[int, float]:
+    """候选切成 RERANK_BATCH_SIZE 一批并发打分，返回的 index 按批起点偏移回全局位置。"""
+    if len(doc_texts) <= RERANK_BATCH_SIZE:
+        return {int(r["index"]): float(r["score"]) for r in rerank_call(query_text, doc_texts)}
+
+    starts = range(0, len(doc_texts), RERANK_BATCH_SIZE)
+    index_to_score: Dict[int, float] = {}
+    futures = {_SEARCH_EXECUTOR.submit(rerank_call, query_text, doc_texts[i:i + RERANK_BATCH_SIZE]): i for i in starts}
+    for fut, start in futures.items():
+        for r in fut.result():
+            index_to_score[start + int(r["index"])] = float(r["score"])
+    return index_to_score
+
 # ========================
 # RRF
 # ========================
 def _fuse_with_rrf(route_results: Dict[str, List[Dict[str, Any]]]) -> Tuple[List[Tuple[str, float]], Dict[str, List[Dict[str, Any]]]]:
-    agg_scores: Dict[str, float] = defaultdict(float)
-    details: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    # 每路按分数排序一次，再把所有路拼成扁平数组，用 factorize + bincount 聚合
+    routes: List[str] = []
+    flat: List[Dict[str, Any]] = []
+    rank_parts: List[np.ndarray] = []
     for route_name, cand_list in route_results.items():
         sorted_cands = sorted(cand_list, key=lambda x: x["score"], reverse=True)
-        for rank, cand in enumerate(sorted_cands, start=1):
-            pid = cand["product_id"]
-            agg_scores[pid] += 1.0 / (RRF_K + rank)
-            details[pid].append({"route": route_name, "rank": rank, "score_raw": float(cand["score"])})
-    return sorted(agg_scores.items(), key=lambda x: x[1], reverse=True), details
+        routes.extend([route_name] * len(sorted_cands))
+        flat.extend(sorted_cands)
+        rank_parts.append(np.arange(1, len(sorted_cands) + 1))
+    if not flat:
+        return [], {}
+
+    pids = np.array([c["product_id"] for c in flat], dtype=object)
+    ranks = np.concatenate(rank_parts)
+    codes, uniques = pd.factorize(pids)
+    agg = np.bincount(codes, weights=1.0 / (RRF_K + ranks))
+
+    details: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for pid, route_name, rank, cand in zip(pids, routes, ranks.tolist(), flat):
+        details[pid].append({"route": route_name, "rank": rank, "score_raw": float(cand["score"])})
+
+    order = _top_k_order(agg, MAX_CANDIDATES_FOR_RERANK * RRF_OVERSAMPLE)
+    return [(uniques[i], float(agg[i])) for i in order], details
+
+def _top_k_order(scores: np.ndarray, k: int) -> np.ndarray:
+    """与 np.argsort(-scores, kind="stable")[:k] 等价：argpartition 先选出前 k，同分时保留靠前的下标。"""
+    if len(scores) <= k:
+        return np.argsort(-scores, kind="stable")
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    top = np.concatenate([above, ties])
+    top.sort()
+    return top[np.argsort(-scores[top], kind="stable")]
 
 # ========================
 # Query 校验
@@ -359,11 +550,10 @@ def search_competitors(
     selected_company: Optional[List[str]] = None,
     selected_channel: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
-    biz_dt, biz_warnings = _get_biz_dt_from_dashvector()
-
     try:
         q0 = _validate_and_normalize_query(query)
     except Exception as e:
+        biz_dt, _ = _get_biz_dt_from_dashvector()
         detail = {"query_raw": query, "candidates": []}
         return _wrap_response_fail(detail, biz_dt=biz_dt, fail_cause=str(e))
 
@@ -377,23 +567,28 @@ def search_competitors(
     else:
         selected_channel = q0["selected_channel"]
 
-    cache_key = json.dumps(
-        {
-            "product_id": query.get("product_id", ""),
-            "product_name": query.get("product_name", ""),
-            "product_track": query.get("product_track", ""),
-            "product_info": query.get("product_info", ""),
-            "selected_company": selected_company,
-            "selected_channel": selected_channel,
-            "rerank_threshold": rerank_threshold,
-            "max_results": max_results,
-            "biz_dt": biz_dt,
-        },
-        ensure_ascii=False,
-        sort_keys=True,
-    )
-    if cache_key in _search_cache:
-        return _search_cache[cache_key]
+    raw = repr((
+        query.get("product_id", ""),
+        query.get("product_name", ""),
+        query.get("product_track", ""),
+        query.get("product_info", ""),
+        tuple(selected_company),
+        tuple(selected_channel),
+        rerank_threshold,
+        max_results,
+    )).encode("utf-8")
+    cache_key = hashlib.blake2b(raw, digest_size=16).digest()
+
+    # 缓存键不含 biz_dt：命中时与当前 meta 的 biz_dt 比对，meta 仍在 _meta_cache 内则无需读 DashVector
+    cached = _search_cache.get(cache_key)
+    if cached is not None:
+        meta = _meta_cache.get(META_CACHE_KEY)
+        if meta is not None and cached["content"]["biz_dt"] == meta[0]:
+            return cached
+
+    biz_dt, biz_warnings = _get_biz_dt_from_dashvector()
+    if cached is not None and cached["content"]["biz_dt"] == biz_dt:
+        return cached
 
     try:
         track = q0["product_track"]
@@ -402,7 +597,11 @@ def search_competitors(
         # 1) product_id fallback
         product_row = None
         effective_pid: Optional[str] = None
+        fut_parsed = None
         if q0["product_id"]:
+            # df 需要回源加载时查找本身就慢：先并行跑 generate_results 作兜底，命中再尽量取消
+            if DF_CACHE_KEY not in _df_cache:
+                fut_parsed = _SPECULATIVE_EXECUTOR.submit(generate_results, product_info)
             try:
                 product_row = _get_product_row(q0["product_id"])
                 effective_pid = str(product_row.name)
@@ -411,25 +610,53 @@ def search_competitors(
                 effective_pid = None
 
         if product_row is not None:
+            if fut_parsed is not None:
+                fut_parsed.cancel()
             parsed_fields: Dict[str, Any] = {field: product_row.get(field, "") for field in TEXT_FIELDS}
         else:
-            parsed = generate_results(product_info)
+            # 投机任务还在排队就取消并直接同步解析，已开始则等它的结果
+            if fut_parsed is not None and not fut_parsed.cancel():
+                parsed = fut_parsed.result()
+            else:
+                parsed = generate_results(product_info)
             parsed_fields = parsed if isinstance(parsed, dict) else {}
             for field in TEXT_FIELDS:
                 parsed_fields.setdefault(field, "")
 
         normalized_query_fields = {f: normalize_field_text(f, parsed_fields.get(f, "")) for f in TEXT_FIELDS}
-        rerank_query_text = build_combined_text_from_fields_map(parsed_fields)
+        rerank_query_text = join_normalized_fields(normalized_query_fields[f] for f in TEXT_FIELDS)
 
         # 2) multi-route recall
         route_results: Dict[str, List[Dict[str, Any]]] = {}
         futures = {}
-        with ThreadPoolExecutor(max_workers=min(8, len(TEXT_FIELDS))) as ex:
-            for field in TEXT_FIELDS:
-                qtext = normalized_query_fields[field]
-                if not qtext.strip():
-                    continue
-                futures[ex.submit(_dashvector_search_cached, field, track, qtext, TOP_K_DASHVECTOR_PER_FIELD, selected_company, selected_channel)] = f"{field}_dv_hybrid"
+        route_fields = [f for f in TEXT_FIELDS if normalized_query_fields[f].strip()]
+
+        # 第一波：对未命中检索缓存的去重 query 文本并发预取 dense/sparse 编码
+        prefetch: Dict[str, List[Any]] = {}
+        for field in route_fields:
+            qtext = normalized_query_fields[field]
+            if qtext in prefetch:
+                continue
+            if _dv_cache_get(_dv_cache_key(field, track, qtext, TOP_K_DASHVECTOR_PER_FIELD, selected_company, selected_channel)) is not None:
+                continue
+            prefetch[qtext] = [_SEARCH_EXECUTOR.submit(get_embedding, qtext), _SEARCH_EXECUTOR.submit(_cached_sparse, qtext)]
+
+        for pfs in prefetch.values():
+            for pf in pfs:
+                pf.exception()
+
+        try:
+            batched = _dashvector_batch_search(route_fields, track, normalized_query_fields, TOP_K_DASHVECTOR_PER_FIELD, selected_company, selected_channel)
+        except Exception:
+            # 与逐字段路径一致：召回失败按无结果处理，而不是整体失败
+            batched = {}
+        if batched is not None:
+            for field in route_fields:
+                if batched.get(field):
+                    route_results[f"{field}_dv_hybrid"] = batched[field]
+        else:
+            for field in route_fields:
+                futures[_SEARCH_EXECUTOR.submit(_dashvector_search_cached, field, track, normalized_query_fields[field], TOP_K_DASHVECTOR_PER_FIELD, selected_company, selected_channel)] = f"{field}_dv_hybrid"
             for fut in as_completed(futures):
                 route_name = futures[fut]
                 try:
@@ -448,42 +675,32 @@ def search_competitors(
         # 3) RRF
         fused_scores, route_details = _fuse_with_rrf(route_results)
 
-        df = _get_df()
-        allow_company = set(selected_company) if selected_company else None
-        allow_channel = set(selected_channel) if selected_channel else None
+        df, pid_to_iloc = _get_df_indexed()
+        # 一次性按位置取出候选行并做公司/渠道过滤，避免逐个 df.loc[pid]
+        fused = [(pid, sc) for pid, sc in fused_scores if effective_pid is None or pid != effective_pid]
+        sub, kept = _rows_by_pids(df, pid_to_iloc, [pid for pid, _ in fused], selected_company, selected_channel)
+        sub_scores = [fused[j][1] for j in kept]
+
+        norm_cols = [NORM_FIELD_PREFIX + field for field in TEXT_FIELDS]
+        cand_cols = [COL_COMPANY_NORM, COL_CHANNEL_NORM, COL_PRODUCT_NAME_STR, COL_TRACK_STR, COL_COMBINED_TEXT, *norm_cols]
 
         candidate_items: List[Dict[str, Any]] = []
-        for pid, fused_score in fused_scores:
-            if effective_pid is not None and pid == effective_pid:
-                continue
+        rows = sub[cand_cols].itertuples(index=True, name=None)
+        for (pid, company, channel, name, cand_track, combined_text, *norms), rrf_score in zip(rows, sub_scores):
             if len(candidate_items) >= MAX_CANDIDATES_FOR_RERANK:
                 break
-            if pid not in df.index:
-                continue
-            row = df.loc[pid]
-            company = str(row.get(COL_COMPANY, "")).strip()
-            channel = str(row.get(COL_CHANNEL, "")).strip()
-
-            if allow_company is not None and company not in allow_company:
-                continue
-            if allow_channel is not None and channel not in allow_channel:
-                continue
-
-            fields_map = {field: row.get(field, "") for field in TEXT_FIELDS}
-            combined_text = build_combined_text_from_fields_map(fields_map)
             if not combined_text.strip():
                 continue
-
             candidate_items.append(
                 {
                     "product_id": pid,
                     "company": company,
                     "channel": channel,
-                    "product_name": str(row.get(COL_PRODUCT_NAME, "")),
-                    "product_track": str(row.get(COL_TRACK, "")),
+                    "product_name": name,
+                    "product_track": cand_track,
                     "combined_text": combined_text,
-                    "fields_map": fields_map,
-                    "rrf_score": float(fused_score),
+                    "norm_fields": dict(zip(TEXT_FIELDS, norms)),
+                    "rrf_score": float(rrf_score),
                     "routes": route_details.get(pid, []),
                 }
             )
@@ -495,13 +712,14 @@ def search_competitors(
             return wrapped
 
         # 4) rerank
-        doc_texts = [item["combined_text"] for item in candidate_items]
-        rerank_res = rerank_call(rerank_query_text, doc_texts)
-        index_to_score = {int(r["index"]): float(r["score"]) for r in rerank_res}
+        # 相同 combined_text 只送一次 rerank，分数按下标广播回各候选
+        uniq_texts: Dict[str, int] = {}
+        text_to_idx = [uniq_texts.setdefault(item["combined_text"], len(uniq_texts)) for item in candidate_items]
+        uniq_scores = _rerank_scores(rerank_query_text, list(uniq_texts))
 
         final_items: List[Dict[str, Any]] = []
         for idx, item in enumerate(candidate_items):
-            score = index_to_score.get(idx)
+            score = uniq_scores.get(text_to_idx[idx])
             if score is None or score < rerank_threshold:
                 continue
             final_items.append(
@@ -516,7 +734,7 @@ def search_competitors(
                     "routes": item["routes"],
                     "evidence": {
                         "combined_text": item["combined_text"],
-                        "fields": {f: normalize_field_text(f, item["fields_map"].get(f, "")) for f in TEXT_FIELDS},
+                        "fields": item["norm_fields"],
                     },
                 }
             )
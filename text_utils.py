@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Text normalisation shared by index build and retrieval.
+
+Both sides must turn a labels/features cell into exactly the same string,
+otherwise query text and indexed text drift apart.
+"""
+import ast
+import json
+from typing import Any
+
+import pandas as pd
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # fall back to stdlib json
+    json_loads = json.loads
+
+def parse_list_like(value: Any) -> str:
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return ""
+    s = str(value).strip()
+    if not s:
+        return ""
+    # JSON 字符串列表走 C 解析器；含转义、bool/None/浮点等与 Python 字面量语义可能不同的情况仍交给 literal_eval
+    if s[0] == "[" and s[-1] == "]" and "\\" not in s:
+        try:
+            obj = json_loads(s)
+        except ValueError:
+            pass
+        else:
+            if isinstance(obj, list) and all(type(x) is str or type(x) is int for x in obj):
+                return " ".join(map(str, obj))
+    try:
+        obj = ast.literal_eval(s)
+        if isinstance(obj, (list, tuple)):
+            return " ".join(map(str, obj))
+    except Exception:
+        pass
+    return s